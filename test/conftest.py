@@ -0,0 +1,6 @@
+import os
+
+# client certificate tests only work when mod_tls is built with client cert support
+collect_ignore = []
+if os.environ.get("MOD_TLS_CLIENT_CERTS", "0") != "1":
+    collect_ignore.append("test_12_cauth.py")
@@ -15,17 +15,16 @@ def get_json_var(name: str, def_val: str = ""):
     return jenc.encode(var)
 
 
-name = None
+names = []
 try:
     form = cgi.FieldStorage()
-    if 'name' in form:
-        name = str(form['name'].value)
+    names = [str(name) for name in form.getlist('name')]
 except Exception:
     pass
 
 print("Content-Type: application/json\n")
-if name:
-    print(f"""{{ "{name}" : {get_json_var(name, '')}}}""")
+if names:
+    print(jenc.encode({name: get_var(name, '') for name in names}))
 else:
     print(f"""{{ "https" : {get_json_var('HTTPS', '')},
   "host" : {get_json_var('SERVER_NAME', '')},
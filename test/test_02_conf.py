@@ -1,4 +1,5 @@
 import os
+import shutil
 from datetime import timedelta
 
 import pytest
@@ -7,13 +8,13 @@ from test_env import TlsTestEnv
 from test_conf import TlsTestConf
 
 
-class TestConf:
+class TestConfFail:
 
     env = TlsTestEnv()
 
     @classmethod
     def setup_class(cls):
-        pass
+        cls.base_conf = TlsTestConf(env=cls.env)
 
     @classmethod
     def teardown_class(cls):
@@ -21,99 +22,143 @@ class TestConf:
             assert cls.env.apache_stop() == 0
 
     def setup_method(self, _method):
-        if self.env.is_live(timeout=timedelta(milliseconds=100)):
+        if self.env.apache_state != "stopped" and self.env.is_live(timeout=timedelta(milliseconds=100)):
             assert self.env.apache_stop() == 0
 
     def test_02_conf_cert_args_missing(self):
-        conf = TlsTestConf(env=self.env)
+        conf = self.base_conf.snapshot()
         conf.add("TLSCertificate")
         conf.write()
         assert self.env.apache_fail() == 0
 
     def test_02_conf_cert_single_arg(self):
-        conf = TlsTestConf(env=self.env)
+        conf = self.base_conf.snapshot()
         conf.add("TLSCertificate cert.pem")
         conf.write()
         assert self.env.apache_fail() == 0
 
     def test_02_conf_cert_file_missing(self):
-        conf = TlsTestConf(env=self.env)
+        conf = self.base_conf.snapshot()
         conf.add("TLSCertificate cert.pem key.pem")
         conf.write()
         assert self.env.apache_fail() == 0
 
     def test_02_conf_cert_file_exist(self):
-        conf = TlsTestConf(env=self.env)
+        conf = self.base_conf.snapshot()
         conf.add(f"TLSEngine {self.env.https_port}")
         conf.add("TLSCertificate test-02-cert.pem test-02-key.pem")
         conf.write()
-        for name in ["test-02-cert.pem", "test-02-key.pem"]:
-            with open(os.path.join(self.env.server_dir, name), "w") as fd:
-                fd.write("")
+        self.env.touch("test-02-cert.pem", "test-02-key.pem")
         assert self.env.apache_fail() == 0
 
     def test_02_conf_cert_listen_missing(self):
-        conf = TlsTestConf(env=self.env)
+        conf = self.base_conf.snapshot()
         conf.add("TLSEngine")
         conf.write()
         assert self.env.apache_fail() == 0
 
     def test_02_conf_cert_listen_wrong(self):
-        conf = TlsTestConf(env=self.env)
+        conf = self.base_conf.snapshot()
         conf.add("TLSEngine ^^^^^")
         conf.write()
         assert self.env.apache_fail() == 0
 
-    @pytest.mark.parametrize("listen", [
-        "443",
-        "129.168.178.188:443",
-        "[::]:443",
+    def test_02_conf_proto_wrong(self):
+        conf = self.base_conf.snapshot()
+        conf.add("TLSProtocol wrong")
+        conf.write()
+        assert self.env.apache_fail() == 0
+
+    def test_02_conf_honor_wrong(self):
+        conf = self.base_conf.snapshot()
+        conf.add("TLSHonorClientOrder wrong")
+        conf.write()
+        assert self.env.apache_fail() == 0
+
+    @pytest.mark.parametrize("cipher", [
+        "wrong",
+        "YOLO",
+        "TLS_NULL_WITH_NULL_NULLX",       # not supported
+        "TLS_DHE_RSA_WITH_AES128_GCM_SHA256",     # not supported
     ])
-    def test_02_conf_cert_listen_valid(self, listen: str):
-        conf = TlsTestConf(env=self.env)
-        conf.add("TLSEngine {listen}".format(listen=listen))
+    def test_02_conf_cipher_wrong(self, cipher):
+        conf = self.base_conf.snapshot()
+        conf.add("TLSCiphersPrefer {cipher}".format(cipher=cipher))
         conf.write()
+        assert self.env.apache_fail() == 0
+
+
+class TestConfValid:
+
+    env = TlsTestEnv()
+
+    # single directive configs, written in advance by setup_class
+    PRECONF_DIR = "preconf"
+    PRECONFS = {
+        "listen": ("TLSEngine {0}", [
+            "443",
+            "129.168.178.188:443",
+            "[::]:443",
+        ]),
+        "proto": ("TLSProtocol {0}", [
+            "default",
+            "TLSv1.2+",
+            "TLSv1.3+",
+            "TLSv0x0303+",
+        ]),
+        "honor": ("TLSHonorClientOrder {0}", [
+            "on",
+            "OfF",
+        ]),
+    }
+
+    @classmethod
+    def setup_class(cls):
+        os.makedirs(os.path.join(cls.env.server_conf_dir, cls.PRECONF_DIR), exist_ok=True)
+        for kind, (directive, values) in cls.PRECONFS.items():
+            for idx, value in enumerate(values):
+                conf = TlsTestConf(env=cls.env, name=cls.preconf_name(kind, idx))
+                conf.add(directive.format(value))
+                conf.write()
+        # start once with a valid base config, each test only reloads
+        cls.base_conf = TlsTestConf(env=cls.env)
+        cls.base_conf.write()
+        assert cls.env.apache_start() == 0
+
+    @classmethod
+    def preconf_name(cls, kind: str, idx: int) -> str:
+        return os.path.join(cls.PRECONF_DIR, f"{kind}-{idx}.conf")
+
+    def use_preconf(self, kind: str, value: str):
+        idx = self.PRECONFS[kind][1].index(value)
+        shutil.copyfile(os.path.join(self.env.server_conf_dir, self.preconf_name(kind, idx)),
+                        os.path.join(self.env.server_conf_dir, "test.conf"))
+
+    @classmethod
+    def teardown_class(cls):
+        if cls.env.is_live(timeout=timedelta(milliseconds=100)):
+            assert cls.env.apache_stop() == 0
+
+    @pytest.mark.parametrize("listen", PRECONFS["listen"][1])
+    def test_02_conf_cert_listen_valid(self, listen: str):
+        self.use_preconf("listen", listen)
         assert self.env.apache_restart() == 0
 
     def test_02_conf_cert_listen_cert(self):
         domain = self.env.domain_a
-        conf = TlsTestConf(env=self.env)
+        conf = self.base_conf.snapshot()
         conf.add_vhosts(domains=[domain])
         conf.write()
         assert self.env.apache_restart() == 0
 
-    def test_02_conf_proto_wrong(self):
-        conf = TlsTestConf(env=self.env)
-        conf.add("TLSProtocol wrong")
-        conf.write()
-        assert self.env.apache_fail() == 0
-
-    @pytest.mark.parametrize("proto", [
-        "default",
-        "TLSv1.2+",
-        "TLSv1.3+",
-        "TLSv0x0303+",
-    ])
+    @pytest.mark.parametrize("proto", PRECONFS["proto"][1])
     def test_02_conf_proto_valid(self, proto):
-        conf = TlsTestConf(env=self.env)
-        conf.add("TLSProtocol {proto}".format(proto=proto))
-        conf.write()
+        self.use_preconf("proto", proto)
         assert self.env.apache_restart() == 0
 
-    def test_02_conf_honor_wrong(self):
-        conf = TlsTestConf(env=self.env)
-        conf.add("TLSHonorClientOrder wrong")
-        conf.write()
-        assert self.env.apache_fail() == 0
-
-    @pytest.mark.parametrize("honor", [
-        "on",
-        "OfF",
-    ])
+    @pytest.mark.parametrize("honor", PRECONFS["honor"][1])
     def test_02_conf_honor_valid(self, honor: str):
-        conf = TlsTestConf(env=self.env)
-        conf.add("TLSHonorClientOrder {honor}".format(honor=honor))
-        conf.write()
+        self.use_preconf("honor", honor)
         assert self.env.apache_restart() == 0
 
     @pytest.mark.parametrize("cipher", [
@@ -127,20 +172,7 @@ class TestConf:
         TLS_ECDHE_ECDSA_WITH_CHACHA20_POLY1305_SHA256:TLS_ECDHE_RSA_WITH_CHACHA20_POLY1305_SHA256"""
     ])
     def test_02_conf_cipher_valid(self, cipher):
-        conf = TlsTestConf(env=self.env)
+        conf = self.base_conf.snapshot()
         conf.add("TLSCiphersPrefer {cipher}".format(cipher=cipher))
         conf.write()
         assert self.env.apache_restart() == 0
-
-    @pytest.mark.parametrize("cipher", [
-        "wrong",
-        "YOLO",
-        "TLS_NULL_WITH_NULL_NULLX",       # not supported
-        "TLS_DHE_RSA_WITH_AES128_GCM_SHA256",     # not supported
-    ])
-    def test_02_conf_cipher_wrong(self, cipher):
-        conf = TlsTestConf(env=self.env)
-        conf.add("TLSCiphersPrefer {cipher}".format(cipher=cipher))
-        conf.write()
-        assert self.env.apache_fail() == 0
-
@@ -1,12 +1,13 @@
 import re
-import time
 from datetime import timedelta
 
 import pytest
 
-from test_env import TlsTestEnv
+from test_env import TlsTestEnv, TlsCipher
 from test_conf import TlsTestConf
 
+RE_PROTOCOL_CIPHER = re.compile(r'^[ \t]+(Protocol|Cipher)[ \t]*:[ \t]*(\S+)$', re.MULTILINE)
+
 
 class TestCiphers:
 
@@ -14,18 +15,53 @@ class TestCiphers:
     domain_a = None
     domain_b = None
 
+    # vhosts, selected via SNI, that prefer a cipher and suppress
+    # all ciphers of the other flavour: (server_name, prefer, suppress)
+    prefer_confs = None
+    # False when a test has replaced the config written by write_class_conf()
+    class_conf_active = False
+
+    @classmethod
+    def prefer_server_name(cls, kind: str, cipher: TlsCipher) -> str:
+        return "{kind}-{id:04x}.{domain}".format(kind=kind, id=cipher.id, domain=cls.env.domain_b)
+
     @classmethod
     def setup_class(cls):
         cls.domain_a = cls.env.domain_a
         cls.domain_b = cls.env.domain_b
+        ciphers_1_2 = [c for c in cls.env.RUSTLS_CIPHERS if c.max_version == 1.2]
+        ecdsa = [c for c in ciphers_1_2 if c.flavour == 'ECDSA']
+        rsa = [c for c in ciphers_1_2 if c.flavour == 'RSA']
+        cls.prefer_confs = []
+        for cipher in ecdsa:
+            cls.prefer_confs.append((cls.prefer_server_name("ecdsa", cipher),
+                                     cipher.name, [c.name for c in rsa]))
+        for cipher in rsa:
+            cls.prefer_confs.append((cls.prefer_server_name("rsa", cipher),
+                                     cipher.name, [c.name for c in ecdsa]))
+            cls.prefer_confs.append((cls.prefer_server_name("rsa-alias", cipher),
+                                     cipher.openssl_name, [c.openssl_name for c in ecdsa]))
+            cls.prefer_confs.append((cls.prefer_server_name("rsa-id", cipher),
+                                     cipher.id_name, [c.id_name for c in ecdsa]))
+        cls.write_class_conf()
+        assert cls.env.apache_restart() == 0
+        cls.class_conf_active = True
+
+    @classmethod
+    def write_class_conf(cls):
         conf = TlsTestConf(env=cls.env)
         conf.add_vhosts(domains=[cls.domain_a, cls.domain_b], extras={
             'base': """
             TLSHonorClientOrder off
             """
         })
+        for server_name, prefer, suppress in cls.prefer_confs:
+            conf.add_vhost(domain=cls.domain_b, server_name=server_name, extras="""
+            TLSHonorClientOrder off
+            TLSCiphersPrefer {0}
+            TLSCiphersSuppress {1}
+            """.format(prefer, ":".join(suppress)))
         conf.write()
-        assert cls.env.apache_restart() == 0
 
     @classmethod
     def teardown_class(cls):
@@ -33,20 +69,23 @@ class TestCiphers:
             assert cls.env.apache_stop() == 0
 
     def setup_method(self, _method):
-        pass
+        if not self.class_conf_active:
+            self.write_class_conf()
+            assert self.env.apache_restart() == 0
+            type(self).class_conf_active = True
+
+    def write_test_conf(self, conf: TlsTestConf):
+        # replace the class config, setup_method restores it for the next test
+        type(self).class_conf_active = False
+        conf.write()
 
     def _get_protocol_cipher(self, output: str):
-        protocol = None
-        cipher = None
-        for line in output.splitlines():
-            m = re.match(r'^\s+Protocol\s*:\s*(\S+)$', line)
-            if m:
-                protocol = m.group(1)
-                continue
-            m = re.match(r'^\s+Cipher\s*:\s*(\S+)$', line)
-            if m:
-                cipher = m.group(1)
-        return protocol, cipher
+        found = {}
+        for m in RE_PROTOCOL_CIPHER.finditer(output):
+            found[m.group(1)] = m.group(2)
+            if len(found) == 2:
+                break
+        return found.get("Protocol"), found.get("Cipher")
 
     def test_06_ciphers_ecdsa(self):
         ecdsa_1_2 = [c for c in self.env.RUSTLS_CIPHERS
@@ -78,22 +117,9 @@ class TestCiphers:
     def test_06_ciphers_server_prefer_ecdsa(self, cipher):
         # Select a ECSDA ciphers as preference and suppress all RSA ciphers.
         # The last is not strictly necessary since rustls prefers ECSDA anyway
-        suppress_names = [c.name for c in self.env.RUSTLS_CIPHERS
-                          if c.max_version == 1.2 and c.flavour == 'RSA']
-        conf = TlsTestConf(env=self.env)
-        conf.add_vhosts(domains=[self.domain_a, self.domain_b], extras={
-            self.domain_b: """
-            TLSHonorClientOrder off
-            TLSCiphersPrefer {0}
-            TLSCiphersSuppress {1}
-            """.format(cipher.name, ":".join(suppress_names)),
-        })
-        conf.write()
-        assert self.env.apache_restart() == 0
-        r = self.env.openssl_client(self.domain_b, extra_args=["-tls1_2"])
-        client_proto, client_cipher = self._get_protocol_cipher(r.stdout)
-        assert client_proto == "TLSv1.2", r.stdout
-        assert client_cipher == cipher.openssl_name, r.stdout
+        client_proto, client_cipher = self.env.tls_cipher_probe(self.prefer_server_name("ecdsa", cipher))
+        assert client_proto == "TLSv1.2"
+        assert client_cipher == cipher.openssl_name
 
     @pytest.mark.parametrize("cipher", [
         c for c in TlsTestEnv.RUSTLS_CIPHERS if c.max_version == 1.2 and c.flavour == 'RSA'
@@ -103,22 +129,9 @@ class TestCiphers:
     def test_06_ciphers_server_prefer_rsa(self, cipher):
         # Select a RSA ciphers as preference and suppress all ECDSA ciphers.
         # The last is necessary since rustls prefers ECSDA and openssl leaks that it can.
-        suppress_names = [c.name for c in self.env.RUSTLS_CIPHERS
-                          if c.max_version == 1.2 and c.flavour == 'ECDSA']
-        conf = TlsTestConf(env=self.env)
-        conf.add_vhosts(domains=[self.domain_a, self.domain_b], extras={
-            self.domain_b: """
-            TLSHonorClientOrder off
-            TLSCiphersPrefer {0}
-            TLSCiphersSuppress {1}
-            """.format(cipher.name, ":".join(suppress_names)),
-        })
-        conf.write()
-        assert self.env.apache_restart() == 0
-        r = self.env.openssl_client(self.domain_b, extra_args=["-tls1_2"])
-        client_proto, client_cipher = self._get_protocol_cipher(r.stdout)
-        assert client_proto == "TLSv1.2", r.stdout
-        assert client_cipher == cipher.openssl_name, r.stdout
+        client_proto, client_cipher = self.env.tls_cipher_probe(self.prefer_server_name("rsa", cipher))
+        assert client_proto == "TLSv1.2"
+        assert client_cipher == cipher.openssl_name
 
     @pytest.mark.parametrize("cipher", [
         c for c in TlsTestEnv.RUSTLS_CIPHERS if c.max_version == 1.2 and c.flavour == 'RSA'
@@ -127,22 +140,9 @@ class TestCiphers:
     ])
     def test_06_ciphers_server_prefer_rsa_alias(self, cipher):
         # same as above, but using openssl names for ciphers
-        suppress_names = [c.openssl_name for c in self.env.RUSTLS_CIPHERS
-                          if c.max_version == 1.2 and c.flavour == 'ECDSA']
-        conf = TlsTestConf(env=self.env)
-        conf.add_vhosts(domains=[self.domain_a, self.domain_b], extras={
-            self.domain_b: """
-            TLSHonorClientOrder off
-            TLSCiphersPrefer {0}
-            TLSCiphersSuppress {1}
-            """.format(cipher.openssl_name, ":".join(suppress_names)),
-        })
-        conf.write()
-        assert self.env.apache_restart() == 0
-        r = self.env.openssl_client(self.domain_b, extra_args=["-tls1_2"])
-        client_proto, client_cipher = self._get_protocol_cipher(r.stdout)
-        assert client_proto == "TLSv1.2", r.stdout
-        assert client_cipher == cipher.openssl_name, r.stdout
+        client_proto, client_cipher = self.env.tls_cipher_probe(self.prefer_server_name("rsa-alias", cipher))
+        assert client_proto == "TLSv1.2"
+        assert client_cipher == cipher.openssl_name
 
     @pytest.mark.parametrize("cipher", [
         c for c in TlsTestEnv.RUSTLS_CIPHERS if c.max_version == 1.2 and c.flavour == 'RSA'
@@ -150,23 +150,10 @@ class TestCiphers:
         c.id_name for c in TlsTestEnv.RUSTLS_CIPHERS if c.max_version == 1.2 and c.flavour == 'RSA'
     ])
     def test_06_ciphers_server_prefer_rsa_id(self, cipher):
-        # same as above, but using openssl names for ciphers
-        suppress_names = [c.id_name for c in self.env.RUSTLS_CIPHERS
-                          if c.max_version == 1.2 and c.flavour == 'ECDSA']
-        conf = TlsTestConf(env=self.env)
-        conf.add_vhosts(domains=[self.domain_a, self.domain_b], extras={
-            self.domain_b: """
-            TLSHonorClientOrder off
-            TLSCiphersPrefer {0}
-            TLSCiphersSuppress {1}
-            """.format(cipher.id_name, ":".join(suppress_names)),
-        })
-        conf.write()
-        assert self.env.apache_restart() == 0
-        r = self.env.openssl_client(self.domain_b, extra_args=["-tls1_2"])
-        client_proto, client_cipher = self._get_protocol_cipher(r.stdout)
-        assert client_proto == "TLSv1.2", r.stdout
-        assert client_cipher == cipher.openssl_name, r.stdout
+        # same as above, but using cipher ids
+        client_proto, client_cipher = self.env.tls_cipher_probe(self.prefer_server_name("rsa-id", cipher))
+        assert client_proto == "TLSv1.2"
+        assert client_cipher == cipher.openssl_name
 
     def test_06_ciphers_pref_unknown(self):
         conf = TlsTestConf(env=self.env)
@@ -175,13 +162,8 @@ class TestCiphers:
             TLSCiphersPrefer TLS_MY_SUPER_CIPHER:SSL_WHAT_NOT
             """
         })
-        conf.write()
+        self.write_test_conf(conf)
         assert self.env.apache_restart() != 0
-        # get a working config again, so that subsequent test cases do not stumble
-        conf = TlsTestConf(env=self.env)
-        conf.add_vhosts(domains=[self.domain_a, self.domain_b])
-        conf.write()
-        self.env.apache_restart()
 
     def test_06_ciphers_pref_unsupported(self):
         # a warning on prefering a known, but not supported cipher
@@ -192,7 +174,7 @@ class TestCiphers:
             TLSCiphersPrefer TLS_NULL_WITH_NULL_NULL
             """
         })
-        conf.write()
+        self.write_test_conf(conf)
         assert self.env.apache_restart() == 0
         (errors, warnings) = self.env.apache_error_log_count()
         assert errors == 0
@@ -205,7 +187,7 @@ class TestCiphers:
             TLSCiphersSuppress TLS_MY_SUPER_CIPHER:SSL_WHAT_NOT
             """
         })
-        conf.write()
+        self.write_test_conf(conf)
         assert self.env.apache_restart() != 0
 
     def test_06_ciphers_supp_unsupported(self):
@@ -217,7 +199,7 @@ class TestCiphers:
             TLSCiphersSuppress TLS_NULL_WITH_NULL_NULL
             """
         })
-        conf.write()
+        self.write_test_conf(conf)
         assert self.env.apache_restart() == 0
         (errors, warnings) = self.env.apache_error_log_count()
         assert errors == 0
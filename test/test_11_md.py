@@ -1,7 +1,6 @@
-import time
 from datetime import timedelta
 
-from test_env import TlsTestEnv, ExecResult
+from test_env import TlsTestEnv
 from test_conf import TlsTestConf
 
 
@@ -20,10 +19,7 @@ class TestMD:
         conf.write()
         assert cls.env.apache_restart() == 0
 
-    @classmethod
-    def teardown_class(cls):
-        if cls.env.is_live(timeout=timedelta(milliseconds=100)):
-            assert cls.env.apache_stop() == 0
+    # no teardown_class: TestMDBase reloads the running server and stops it
 
     def test_11_get_a(self):
         # do we see the correct json for the domain_a?
@@ -35,11 +31,25 @@ class TestMD:
         data = self.env.https_get_json(self.env.domain_b, "/index.json")
         assert data == {'domain': self.env.domain_b}
 
-    def test_11_get_base(self):
-        # give the base server domain_a and lookup its index.json
-        conf = TlsTestConf(env=self.env)
-        conf.add_md_base(domain=self.env.domain_a)
+
+class TestMDBase:
+
+    env = TlsTestEnv()
+
+    @classmethod
+    def setup_class(cls):
+        # give the base server domain_a
+        conf = TlsTestConf(env=cls.env)
+        conf.add_md_base(domain=cls.env.domain_a)
         conf.write()
-        assert self.env.apache_restart() == 0
+        assert cls.env.apache_restart() == 0
+
+    @classmethod
+    def teardown_class(cls):
+        if cls.env.is_live(timeout=timedelta(milliseconds=100)):
+            assert cls.env.apache_stop() == 0
+
+    def test_11_get_base(self):
+        # lookup the index.json of the base server
         data = self.env.https_get_json(self.env.domain_a, "/index.json")
         assert data == {'domain': 'localhost'}
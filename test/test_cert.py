@@ -71,6 +71,7 @@ class Credentials:
         self._name = name
         self._subject = subject
         self._cert = cert
+        self._cert_pem = cert.public_bytes(Encoding.PEM)
         self._pkey = pkey
         self._key_type = key_type
         self._issuer = issuer
@@ -100,7 +101,7 @@ class Credentials:
 
     @property
     def cert_pem(self) -> bytes:
-        return self._cert.public_bytes(Encoding.PEM)
+        return self._cert_pem
 
     @property
     def pkey_pem(self) -> bytes:
@@ -1,3 +1,4 @@
+import copy
 import os
 from typing import List, Union, Dict
 
@@ -6,6 +7,8 @@ from test_env import TlsTestEnv
 
 class TlsTestConf:
 
+    __slots__ = ("env", "name", "_mpm_type", "_content")
+
     def __init__(self, env: TlsTestEnv, name: str = "test.conf", mpm_type: str = None):
         self.env = env
         self.name = name
@@ -17,6 +20,12 @@ class TlsTestConf:
             ),
         ]
 
+    def snapshot(self) -> 'TlsTestConf':
+        # a copy to add to, leaving this conf as it is
+        conf = copy.copy(self)
+        conf._content = self._content.copy()
+        return conf
+
     def add(self, text: Union[List[str], str]) -> None:
         if isinstance(text, List):
             self._content.extend(text)
@@ -24,8 +33,17 @@ class TlsTestConf:
             self._content.append(text)
 
     def write(self) -> None:
-        with open(os.path.join(self.env.server_conf_dir, self.name), "w") as fd:
-            fd.write("\n".join(self._content))
+        # write to a temp file and rename, so apache never sees a partial config
+        path = os.path.join(self.env.server_conf_dir, self.name)
+        tmp_path = f"{path}.tmp"
+        try:
+            with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644), "wb") as fd:
+                fd.write("\n".join(self._content).encode())
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
 
     def add_vhosts(self, domains: List[str], extras: Dict[str, str] = None):
         extras = extras if extras is not None else {}
@@ -38,26 +56,32 @@ LogLevel tls:trace4
             extras=extras['base'] if 'base' in extras else "",
         ))
         for domain in domains:
-            self.add("""
+            self.add_vhost(domain=domain, extras=extras[domain] if domain in extras else "")
+
+    def add_vhost(self, domain: str, extras: str = "", server_name: str = None):
+        # a vhost serving the certificates and documents of domain, reachable
+        # via SNI for server_name if given
+        self.add("""
     <VirtualHost *:{https}>
-      ServerName {domain}
+      ServerName {server_name}
       DocumentRoot htdocs/{domain}
                  """.format(
-                    https=self.env.https_port,
-                    domain=domain))
-            for cred in self.env.get_certs_for(domain):
-                cert_file = os.path.relpath(cred.cert_file, self.env.server_dir)
-                pkey_file = os.path.relpath(cred.pkey_file, self.env.server_dir) if cred.pkey_file else ""
-                self.add("  TLSCertificate {cert_file} {pkey_file}".format(
-                    cert_file = cert_file,
-                    pkey_file = pkey_file,
-                ))
-            self.add("""
+                https=self.env.https_port,
+                server_name=server_name if server_name is not None else domain,
+                domain=domain))
+        for cred in self.env.get_certs_for(domain):
+            cert_file = os.path.relpath(cred.cert_file, self.env.server_dir)
+            pkey_file = os.path.relpath(cred.pkey_file, self.env.server_dir) if cred.pkey_file else ""
+            self.add("  TLSCertificate {cert_file} {pkey_file}".format(
+                cert_file = cert_file,
+                pkey_file = pkey_file,
+            ))
+        self.add("""
       {extras}
     </VirtualHost>
-                """.format(
-                    extras=extras[domain] if domain in extras else ""
-                ))
+            """.format(
+                extras=extras
+            ))
 
     def add_ssl_vhosts(self, domains: List[str], extras: Dict[str, str] = None):
         extras = extras if extras is not None else {}
@@ -3,6 +3,9 @@ import json
 import logging
 import os
 import re
+import shutil
+import socket
+import ssl
 import subprocess
 import sys
 import time
@@ -140,18 +143,29 @@ class TlsTestEnv:
         our_dir = os.path.dirname(inspect.getfile(TlsTestEnv))
         config = ConfigParser()
         config.read(os.path.join(our_dir, 'test.ini'))
+        # when run by pytest-xdist, each worker gets its own server and ports
+        worker_id = os.environ.get('PYTEST_XDIST_WORKER')
+        m = re.match(r'^gw(\d+)$', worker_id) if worker_id else None
+        port_offset = 10 * int(m.group(1)) if m else 0
         self._prefix = config.get('global', 'prefix')
         self._gen_dir = os.path.join(our_dir, 'gen')
         self._server_dir = os.path.join(self._gen_dir, 'apache')
         self._server_conf_dir = os.path.join(self._server_dir, "conf")
         self._server_docs_dir = os.path.join(self._server_dir, "htdocs")
         self._server_error_log = os.path.join(self._server_dir, "logs", "error_log")
+        self._server_pid_file = os.path.join(self._server_dir, "logs", "httpd.pid")
+        self._live_cache = {}
+        # what we last did to apache: 'unknown', 'running' or 'stopped'
+        self._apache_state = "unknown"
         self._mpm_type = os.environ['MPM'] if 'MPM' in os.environ else 'event'
 
         self._apachectl = os.path.join(self._prefix, 'bin', 'apachectl')
         self._httpd = os.path.join(self._prefix, 'bin', 'httpd')
         self._http_port = int(config.get('global', 'http_port'))
         self._https_port = int(config.get('global', 'https_port'))
+        if m:
+            self._setup_worker_server(worker_dir=os.path.join(self._gen_dir, f"apache-{worker_id}"),
+                                      port_offset=port_offset)
 
         self._http_base = "http://127.0.0.1:{port}".format(port=self._http_port)
         self._httpd_check_url = self._http_base
@@ -163,6 +177,49 @@ class TlsTestEnv:
         self._openssl = config.get('global', 'openssl_bin')
         TlsTestEnv.init_class(self._server_dir)
 
+    RE_SERVER_ROOT = re.compile(r'^\s*ServerRoot\s+"([^"]+)"', re.MULTILINE)
+
+    def _setup_worker_server(self, worker_dir: str, port_offset: int):
+        # clone the server setup made by 'make test' with our own ports,
+        # again whenever 'make test' has updated it since
+        setup_stamp = os.path.join(self._server_dir, '.test-setup')
+        worker_stamp = os.path.join(worker_dir, '.test-setup')
+        if not os.path.exists(worker_stamp) or not os.path.exists(setup_stamp) \
+                or os.stat(setup_stamp).st_mtime > os.stat(worker_stamp).st_mtime:
+            for name in ['conf', 'htdocs']:
+                shutil.copytree(os.path.join(self._server_dir, name),
+                                os.path.join(worker_dir, name), dirs_exist_ok=True)
+            os.makedirs(os.path.join(worker_dir, 'logs'), exist_ok=True)
+            conf_file = os.path.join(worker_dir, 'conf', 'httpd.conf')
+            with open(conf_file) as fd:
+                conf = fd.read()
+            # paths in httpd.conf are as configure saw them, which may differ
+            # from ours (symlinks), so take the server root from the file itself
+            m = self.RE_SERVER_ROOT.search(conf)
+            if m is None:
+                raise Exception(f"no ServerRoot found in {conf_file}")
+            conf = conf.replace(f'"{m.group(1)}', f'"{worker_dir}')
+            m = self.RE_SERVER_ROOT.search(conf)
+            if m is None or m.group(1) != worker_dir:
+                raise Exception(f"ServerRoot in {conf_file} does not point to {worker_dir}")
+            for port in [self._http_port, self._https_port]:
+                conf = re.sub(r'\b{0}\b'.format(port), str(port + port_offset), conf)
+            with open(conf_file, 'w') as fd:
+                fd.write(conf)
+            with open(worker_stamp, 'w'):
+                pass
+        self._server_dir = worker_dir
+        self._server_conf_dir = os.path.join(self._server_dir, "conf")
+        self._server_docs_dir = os.path.join(self._server_dir, "htdocs")
+        self._server_error_log = os.path.join(self._server_dir, "logs", "error_log")
+        self._server_pid_file = os.path.join(self._server_dir, "logs", "httpd.pid")
+        self._http_port += port_offset
+        self._https_port += port_offset
+
+    @property
+    def apache_state(self) -> str:
+        return self._apache_state
+
     @property
     def prefix(self) -> str:
         return self._prefix
@@ -218,6 +275,12 @@ class TlsTestEnv:
     def get_certs_for(self, domain: str) -> List[Credentials]:
         return self.CA.get_credentials_for_name(domain)
 
+    def touch(self, *names: str):
+        # create empty files in the server dir
+        for name in names:
+            fd = os.open(os.path.join(self._server_dir, name), os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o644)
+            os.close(fd)
+
     @staticmethod
     def run(args: List[str]) -> ExecResult:
         log.debug("run: {0}", " ".join(args))
@@ -229,8 +292,31 @@ class TlsTestEnv:
 
     # --------- HTTP ---------
 
+    # is_live() results are reused for this long, unless apache got controlled
+    # by us or its pid file changed in between
+    LIVE_CACHE_TTL = timedelta(milliseconds=500)
+
+    def _pid_file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self._server_pid_file).st_mtime
+        except OSError:
+            return None
+
     def is_live(self, url: str = None, timeout: timedelta = None):
         url = url if url else self._httpd_check_url
+        timeout = timeout if timeout is not None else timedelta(seconds=20)
+        pid_mtime = self._pid_file_mtime()
+        if url in self._live_cache:
+            checked, cached_mtime, cached_timeout, rv = self._live_cache[url]
+            # a negative result only answers calls that would not have waited longer
+            if time.monotonic() - checked < self.LIVE_CACHE_TTL.total_seconds() \
+                    and cached_mtime == pid_mtime and (rv or timeout <= cached_timeout):
+                return rv
+        rv = self._check_live(url=url, timeout=timeout)
+        self._live_cache[url] = (time.monotonic(), self._pid_file_mtime(), timeout, rv)
+        return rv
+
+    def _check_live(self, url: str, timeout: timedelta = None):
         server = urlparse(url)
         timeout = timeout if timeout is not None else timedelta(seconds=20)
         try_until = time.time() + timeout.total_seconds()
@@ -283,6 +369,7 @@ class TlsTestEnv:
 
     def apachectl(self, cmd, check_live=True):
         args = [self._apachectl, "-d", self._server_dir, "-k", cmd]
+        self._live_cache.clear()
         p = subprocess.run(args, capture_output=True, text=True)
         rv = p.returncode
         if rv == 0:
@@ -296,6 +383,10 @@ class TlsTestEnv:
                 log.debug("waited for a apache.is_dead, rv=%d" % rv)
         else:
             log.warning("exit %d, stderr: %s" % (rv, p.stderr))
+        if rv == 0:
+            self._apache_state = "running" if check_live else "stopped"
+        else:
+            self._apache_state = "unknown"
         return rv
 
     def apache_restart(self):
@@ -311,11 +402,16 @@ class TlsTestEnv:
         rv = self.apachectl("graceful", check_live=False)
         if rv != 0:
             log.warning("graceful restart returned: {0}".format(rv))
-            return 0 if self.is_dead(timeout=timedelta(seconds=5)) else -1
+            if not self.is_dead(timeout=timedelta(seconds=5)):
+                return -1
+            self._apache_state = "stopped"
+            return 0
         return rv
 
     def apache_try_start(self):
         args = [self._apachectl, "-d", self._server_dir, "-k", "start"]
+        self._live_cache.clear()
+        self._apache_state = "unknown"
         return self.run(args)
 
     def apache_error_log_clear(self):
@@ -385,6 +481,19 @@ class TlsTestEnv:
         args.extend([])
         return self.openssl(args)
 
+    def tls_cipher_probe(self, domain: str, cipher: str = None,
+                         tls_version: ssl.TLSVersion = ssl.TLSVersion.TLSv1_2) -> Tuple[str, str]:
+        # handshake in-process and return the negotiated protocol and (openssl) cipher name
+        ctx = ssl.create_default_context()
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        ctx.minimum_version = ctx.maximum_version = tls_version
+        if cipher:
+            ctx.set_ciphers(cipher)
+        with socket.create_connection(("127.0.0.1", self.https_port), timeout=10) as sock:
+            with ctx.wrap_socket(sock, server_hostname=domain) as tls_sock:
+                return tls_sock.version(), tls_sock.cipher()[0]
+
     CURL_SUPPORTS_TLS_1_3 = None
 
     def curl_supports_tls_1_3(self) -> bool: